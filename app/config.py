@@ -1,9 +1,9 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     APP_NAME: str = "Azru"
     
-    # MQTT Config
     # MQTT Config
     MQTT_BROKER: str = "mosquitto" # Keeping for backward compat or use MQTT_BROKER_HOST
     MQTT_BROKER_HOST: str = "mosquitto"
@@ -29,6 +29,8 @@ class Settings(BaseSettings):
     SIM_START_DATE: str = "2026-02-17T00:00:00" # Fixed start date for reproducibility
     SIM_INITIAL_TEMP: float = 19.0
     SIM_SENSOR_NOISE_STD: float = 0.1
+    SIM_CLOCK_EVERY_N_TICKS: int = 10 # Clock topic publish period (metrics carry sim_time every tick)
+    SIM_MPC_INTERVAL: int = 3600 # s between two MPC solves in the batch simulation (valve held in between)
 
     # Physics Model Config (ISO 13790 / 5R1C)
     SIM_BUILDING_CLASS: str = "heavy" # light, medium, heavy, very_heavy
@@ -54,6 +56,12 @@ class Settings(BaseSettings):
     T_MAX: float = 24.0
     RHO: float = 10.0
 
-    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+    # Frozen: the cached instance is shared by every service and the event loop
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore", frozen=True)
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Parse .env / environment once per process (tests can call get_settings.cache_clear())."""
+    return Settings()
 
-settings = Settings()
+settings = get_settings()
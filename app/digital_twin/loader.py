@@ -1,12 +1,17 @@
 import json
-import math
 import logging
-from typing import Dict, List, Any
-from datetime import datetime, timedelta
+import numpy as np
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping
 
 logger = logging.getLogger(__name__)
 
+MINUTES_PER_DAY = 1440
+
 class ScenarioLoader:
+    __slots__ = ("scenario_path", "data", "_weather_table", "_hp_price", "_hc_price", "_peak_mask",
+                 "_hp_result", "_hc_result")
+
     def __init__(self, scenario_path: str):
         self.scenario_path = scenario_path
         self.data = self._load_scenario()
@@ -14,46 +19,68 @@ class ScenarioLoader:
     def _load_scenario(self) -> Dict[str, Any]:
         try:
             with open(self.scenario_path, 'r') as f:
-                return json.load(f)
+                data = json.load(f)
         except Exception as e:
             logger.error(f"Failed to load scenario {self.scenario_path}: {e}")
-            return {}
+            data = {}
 
-    def get_weather_at(self, day_index: int, hour: float) -> Dict[str, float]:
-        """Get weather conditions (T_ext, nebulosity) for a given time."""
-        days = self.data.get("weather", [])
-        day_data = days[day_index % len(days)] # Loop if scenario is shorter
-        
-        # Interpolate Temperature (Sinusoidal between min/max)
-        t_min = day_data.get("t_min", 0)
-        t_max = day_data.get("t_max", 10)
-        
+        # The scenario is static: tabulate weather (per minute) and tariffs (per hour) once
+        self._weather_table = self._build_weather_table(data.get("weather", []))
+        self._build_price_mask(data.get("prices", {}))
+        return data
+
+    @staticmethod
+    def _build_weather_table(days: List[Dict[str, Any]]) -> np.ndarray:
+        """Precompute (T_ext, nebulosity) for every minute of every scenario day -> shape (n_days, 1440, 2)."""
+        hours = np.arange(MINUTES_PER_DAY) / 60.0
         # Classic day cycle: Min at 4am, Max at 4pm (16h)
         # T(h) = (Tmax+Tmin)/2 - (Tmax-Tmin)/2 * cos(pi * (h - 4) / 12)
-        avg = (t_max + t_min) / 2
-        amp = (t_max - t_min) / 2
-        t_ext = avg - amp * math.cos(math.pi * (hour - 4) / 12)
-        
+        cycle = np.cos(np.pi * (hours - 4) / 12)
+
+        table = np.empty((len(days), MINUTES_PER_DAY, 2))
+        for d, day_data in enumerate(days):
+            t_min = day_data.get("t_min", 0)
+            t_max = day_data.get("t_max", 10)
+            avg = (t_max + t_min) / 2
+            amp = (t_max - t_min) / 2
+            table[d, :, 0] = avg - amp * cycle
+            table[d, :, 1] = day_data.get("nebulosity", 0.0)
+        return table
+
+    def _build_price_mask(self, prices: Dict[str, Any]):
+        """Precompute HP/HC prices and a 24-bucket peak-hour mask."""
+        self._hp_price = float(prices.get("hp", 0.2516))
+        self._hc_price = float(prices.get("hc", 0.2068))
+        self._peak_mask = np.zeros(24, dtype=bool)
+        for start, end in prices.get("peak_hours", [[6, 14], [17, 21]]):
+            self._peak_mask[start:end] = True
+        # Only two possible answers: build them once (read-only, shared by every caller)
+        self._hp_result = MappingProxyType({"price": self._hp_price, "tariff": "HP"})
+        self._hc_result = MappingProxyType({"price": self._hc_price, "tariff": "HC"})
+
+    def get_weather_at(self, day_index: int, hour: float) -> Dict[str, float]:
+        """Get weather conditions (T_ext, nebulosity) for a given time."""
+        d = day_index % len(self._weather_table) # Loop if scenario is shorter
+        idx = int(round(hour * 60)) % MINUTES_PER_DAY
+        row = self._weather_table[d, idx]
+
         return {
-            "temperature": t_ext,
-            "nebulosity": day_data.get("nebulosity", 0.0)
+            "temperature": float(row[0]),
+            "nebulosity": float(row[1])
         }
 
-    def get_price_at(self, day_index: int, hour: float) -> Dict[str, Any]:
-        """Get electricity price and tariff type (HP/HC) for a given time."""
-        prices = self.data.get("prices", {})
-        hp_price = prices.get("hp", 0.2516)
-        hc_price = prices.get("hc", 0.2068)
-        peak_hours = prices.get("peak_hours", [[6, 14], [17, 21]])
-        
-        # Check if current hour falls within a peak period
-        is_peak = False
-        for start, end in peak_hours:
-            if start <= hour < end:
-                is_peak = True
-                break
-        
-        if is_peak:
-            return {"price": hp_price, "tariff": "HP"}
-        else:
-            return {"price": hc_price, "tariff": "HC"}
+    def get_weather_series(self, day_index: np.ndarray, hour: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Vectorized get_weather_at: (T_ext, nebulosity) arrays for arrays of day indices and hours."""
+        d = np.asarray(day_index) % len(self._weather_table)
+        idx = np.rint(np.asarray(hour) * 60).astype(int) % MINUTES_PER_DAY
+        rows = self._weather_table[d, idx]
+        return rows[..., 0], rows[..., 1]
+
+    def get_price_at(self, day_index: int, hour: float) -> Mapping[str, Any]:
+        """Get electricity price and tariff type (HP/HC) for a given time (read-only mapping)."""
+        return self._hp_result if self._peak_mask[int(hour) % 24] else self._hc_result
+
+    def get_price_series(self, hour: np.ndarray) -> np.ndarray:
+        """Vectorized get_price_at: electricity price (€/kWh) for an array of hours."""
+        peak = self._peak_mask[np.asarray(hour).astype(int) % 24]
+        return np.where(peak, self._hp_price, self._hc_price)
@@ -1,5 +1,5 @@
 import logging
-import math
+import numpy as np
 from datetime import datetime
 try:
     from app.digital_twin.rc_simulator.building_physics import Zone
@@ -10,15 +10,87 @@ except ImportError:
     Zone = None
     logging.warning("RC_BuildingSimulator not found. Physics will fail if run.")
 
-from app.config import settings
+try:
+    from numba import njit
+except ImportError:
+    # Same kernels, interpreted, when numba is not installed
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+
+@njit(cache=True)
+def rc_step(t_m_prev, t_ext, p_int, p_sol, valve, t_m_coef, t_air_coef):
+    """
+    One linearized 5R1C (Crank-Nicolson) step, valve in % (see BuildingPhysics.__init__ for the coefficients).
+    Returns (t_air, t_m).
+    """
+    m0, m1, m2, m3, m4 = t_m_coef
+    a0, a1, a2, a3, a4 = t_air_coef
+    t_air = a0 * t_m_prev + a1 * t_ext + a2 * p_int + a3 * p_sol + a4 * valve
+    t_m = m0 * t_m_prev + m1 * t_ext + m2 * p_int + m3 * p_sol + m4 * valve
+    return t_air, t_m
+
+@njit(cache=True)
+def thermostat_trajectory(t_m_prev, valve_pos, t_ext, p_sol, p_int, t_m_coef, t_air_coef, t_on, t_off):
+    """
+    Integrate the linearized 5R1C step over len(t_ext) steps under a hysteresis thermostat.
+    Returns (t_air, t_m, valve) where valve[k] is the position after the thermostat at step k.
+    """
+    n = len(t_ext)
+    t_air_out = np.empty(n)
+    t_m_out = np.empty(n)
+    valve_out = np.empty(n)
+    t_m = t_m_prev
+    valve = valve_pos
+    for k in range(n):
+        t_air, t_m = rc_step(t_m, t_ext[k], p_int, p_sol[k], valve, t_m_coef, t_air_coef)
+        if t_air < t_on:
+            valve = 100.0
+        elif t_air > t_off:
+            valve = 0.0
+        t_air_out[k] = t_air
+        t_m_out[k] = t_m
+        valve_out[k] = valve
+    return t_air_out, t_m_out, valve_out
+
+@njit(cache=True)
+def setpoint_trajectory(t_air0, t_m0, t_ext, p_sol, p_int, t_m_coef, t_air_coef, t_low):
+    """
+    Integrate the 5R1C step under a threshold controller deciding on the current air temperature:
+    valve 100% below t_low, 0% otherwise (ManualController), then step.
+    Returns (t_air, t_m, valve) where valve[k] is the position applied during step k.
+    """
+    n = len(t_ext)
+    t_air_out = np.empty(n)
+    t_m_out = np.empty(n)
+    valve_out = np.empty(n)
+    t_air = t_air0
+    t_m = t_m0
+    for k in range(n):
+        valve = 100.0 if t_air < t_low else 0.0
+        t_air, t_m = rc_step(t_m, t_ext[k], p_int, p_sol[k], valve, t_m_coef, t_air_coef)
+        t_air_out[k] = t_air
+        t_m_out[k] = t_m
+        valve_out[k] = valve
+    return t_air_out, t_m_out, valve_out
+
 class BuildingPhysics:
+    # Read on every simulation tick: fixed attribute layout, no per-instance __dict__
+    __slots__ = ("heater_max_power", "zone", "_t_m_coef", "_t_air_coef", "solar_factor", "_angle_factor")
+
     def __init__(self):
         if Zone is None:
             raise ImportError("RC_BuildingSimulator library is missing. Install it via requirements.txt")
-            
+
+        settings = get_settings()
+        self.heater_max_power = settings.SIM_HEATER_MAX_POWER
+
         # Map "heavy/light" to thermal capacitance
         # ISO 13790 defaults (J/m2K):
         # Light: 110,000 / Medium: 165,000 / Heavy: 260,000 / Very Heavy: 370,000
@@ -48,25 +120,49 @@ class BuildingPhysics:
             t_set_cooling=settings.T_MAX,
             dt=settings.SIM_TIME_STEP,
         )
+
+        # The Crank-Nicolson step is linear in (t_m_prev, t_ext, p_int, p_sol, heating power) with no
+        # constant term: probe the library once per unit input and keep the coefficients.
+        t_m_coef, t_air_coef = [], []
+        for t_m_prev, t_out, p_int, p_sol, p_heat in np.eye(5).tolist():
+            t_m, t_air, _ = self.zone.calc_temperatures_crank_nicolson(
+                energy_demand=p_heat, internal_gains=p_int, solar_gains=p_sol, t_out=t_out, t_m_prev=t_m_prev
+            )
+            t_m_coef.append(t_m)
+            t_air_coef.append(t_air)
+        # Fold the valve % -> Watts conversion into the heating coefficient
+        t_m_coef[4] *= self.heater_max_power / 100.0
+        t_air_coef[4] *= self.heater_max_power / 100.0
+        self._t_m_coef = tuple(t_m_coef)
+        self._t_air_coef = tuple(t_air_coef)
+        # Compile (or load from numba's cache) the kernels now rather than on the first simulated step
+        self.simulate_thermostat(0.0, 0.0, np.zeros(1), np.zeros(1), 0.0, 0.0, 0.0)
+        self.simulate_setpoint(0.0, 0.0, np.zeros(1), np.zeros(1), 0.0, 0.0)
+
+        # 0.7 is a default G-value
+        self.solar_factor = 0.7
+        # Incidence angle factor for each minute of the day: sin wave between 6h and 18h, zero at night
+        hours = np.arange(1440) / 60.0
+        daylight = (hours >= 6) & (hours <= 18)
+        self._angle_factor = np.zeros(1440)
+        self._angle_factor[daylight] = np.sin(np.pi * (hours[daylight] - 6) / 12)
         
     def calculate_solar_gain(self, current_time: datetime, nebulosity: float) -> float:
         """
         Calculate solar power entering the room (W).
         Simple model: Max at noon, zero at night.
         """
-        hour = current_time.hour + current_time.minute / 60.0
-        
-        # Simple solar model: sin wave between 6h and 18h
-        if 6 <= hour <= 18:
-            # Peak solar irradiance (W/m2) - heavily simplified
-            max_irradiance = 800 * (1 - nebulosity)
-            # Incidence angle factor (sinusoidal)
-            angle_factor = math.sin(math.pi * (hour - 6) / 12)
-            
-            solar_power_density = max_irradiance * angle_factor
-            # 0.7 is a default G-value
-            return solar_power_density * self.zone.window_area * 0.7
-        return 0.0
+        idx = current_time.hour * 60 + current_time.minute
+        # Peak solar irradiance (W/m2) - heavily simplified
+        max_irradiance = 800 * (1 - nebulosity)
+        return float(max_irradiance * self._angle_factor[idx]) * self.zone.window_area * self.solar_factor
+
+    def calculate_solar_gain_batch(self, hour: np.ndarray, nebulosity: np.ndarray) -> np.ndarray:
+        """
+        Vectorized calculate_solar_gain over arrays of hour-of-day and nebulosity (W).
+        """
+        idx = np.rint(np.asarray(hour) * 60).astype(int) % 1440
+        return 800 * (1 - nebulosity) * self._angle_factor[idx] * self.zone.window_area * self.solar_factor
 
     def calculate_next_state(self, t_air_prev: float, t_m_prev: float, t_ext: float, 
                            valve_pos: float, p_sol: float, p_int: float) -> tuple[float, float]:
@@ -76,28 +172,42 @@ class BuildingPhysics:
         :param valve_pos: Valve position (0-100%)
         :return: (t_air_next, t_m_next)
         """
-        # Convert Valve % to Heating Power (Watts)
-        # Detailed wrapping: The library expects `energy_demand` to be calculated internally 
-        # based on setpoints. BUT we want to force the power based on the MPC/Valve.
-        # So we bypass `solve_energy` and call `calc_temperatures_crank_nicolson` directly
-        # with our forced energy input.
-        
-        heating_power = (valve_pos / 100.0) * settings.SIM_HEATER_MAX_POWER
-        
-        # Total gains
-        # Note: The library function signature is:
-        # calc_temperatures_crank_nicolson(self, energy_demand, internal_gains, solar_gains, t_out, t_m_prev)
-        
-        # We treat our Heating Power as the "energy_demand" supplied to the room.
-        # Positive value = Heating.
-        
-        self.zone.calc_temperatures_crank_nicolson(
-            energy_demand=heating_power,
-            internal_gains=p_int,
-            solar_gains=p_sol,
-            t_out=t_ext,
-            t_m_prev=t_m_prev
+        # Equivalent to calling zone.calc_temperatures_crank_nicolson with
+        # energy_demand = (valve_pos / 100) * SIM_HEATER_MAX_POWER (forced power instead of the library's
+        # setpoint-driven `solve_energy`), using the coefficients precomputed in __init__.
+        # Note: like the library, T_m is the average bulk temperature over the step.
+        # Same arithmetic as the rc_step kernel, kept inline: for one scalar step, a call into a jitted
+        # function costs more than the ten multiply-adds.
+        m0, m1, m2, m3, m4 = self._t_m_coef
+        a0, a1, a2, a3, a4 = self._t_air_coef
+        t_m = m0 * t_m_prev + m1 * t_ext + m2 * p_int + m3 * p_sol + m4 * valve_pos
+        t_air = a0 * t_m_prev + a1 * t_ext + a2 * p_int + a3 * p_sol + a4 * valve_pos
+        return t_air, t_m
+
+    def simulate_thermostat(self, t_m_prev: float, valve_pos: float, t_ext: np.ndarray, p_sol: np.ndarray,
+                            p_int: float, t_on: float, t_off: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Chain calculate_next_state over arrays of forcing, with a hysteresis thermostat closing the loop
+        (valve 100% below t_on, 0% above t_off, unchanged in between).
+
+        :return: (t_air, t_m, valve) arrays, valve being the position applied from the next step on
+        """
+        return thermostat_trajectory(
+            float(t_m_prev), float(valve_pos),
+            np.ascontiguousarray(t_ext, dtype=np.float64), np.ascontiguousarray(p_sol, dtype=np.float64),
+            float(p_int), self._t_m_coef, self._t_air_coef, float(t_on), float(t_off)
+        )
+
+    def simulate_setpoint(self, t_air0: float, t_m0: float, t_ext: np.ndarray, p_sol: np.ndarray,
+                          p_int: float, t_low: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Chain calculate_next_state over arrays of forcing, the valve being set before each step from the
+        current air temperature (100% below t_low, 0% otherwise).
+
+        :return: (t_air, t_m, valve) arrays, valve[k] being the position used for step k
+        """
+        return setpoint_trajectory(
+            float(t_air0), float(t_m0),
+            np.ascontiguousarray(t_ext, dtype=np.float64), np.ascontiguousarray(p_sol, dtype=np.float64),
+            float(p_int), self._t_m_coef, self._t_air_coef, float(t_low)
         )
-        
-        # The zone object updates its internal state: zone.t_air and zone.t_m
-        return self.zone.t_air, self.zone.t_m
@@ -1,23 +1,37 @@
 import asyncio
 import logging
-import json
+import orjson
 import time
-import random
+import numpy as np
 from datetime import datetime, timedelta
 from aiomqtt import Client
-from app.config import settings
+from app.config import get_settings
 from app.digital_twin.physics import BuildingPhysics
 from app.digital_twin.loader import ScenarioLoader
 
 logger = logging.getLogger("Simulator")
 logging.basicConfig(level=logging.INFO)
 
+NOISE_POOL_SIZE = 8192
+PUBLISH_QUEUE_SIZE = 64
+
 class Simulator:
     def __init__(self, scenario_file=None, speed_factor=None):
+        settings = get_settings()
         self.scenario_file = scenario_file if scenario_file else settings.SIM_SCENARIO_FILE
         self.speed_factor = speed_factor if speed_factor else settings.SIM_SPEED_FACTOR
         self.loader = ScenarioLoader(self.scenario_file)
         self.physics = BuildingPhysics() # Will use settings defaults
+        self.noise_std = settings.SIM_SENSOR_NOISE_STD
+        # Sensor noise drawn in blocks from NumPy's generator rather than one random.gauss per tick
+        self._rng = np.random.default_rng()
+        self._noise_pool = self._rng.normal(0.0, self.noise_std, NOISE_POOL_SIZE)
+        self._noise_idx = 0
+        self.topic_clock = settings.MQTT_TOPIC_CLOCK
+        self.topic_metrics = settings.MQTT_TOPIC_METRICS
+        self.clock_every = max(1, settings.SIM_CLOCK_EVERY_N_TICKS)
+        self._tick = 0
+        self._publish_q: asyncio.Queue = asyncio.Queue(maxsize=PUBLISH_QUEUE_SIZE)
         
         # State
         # Start at current wall-clock time. 
@@ -33,9 +47,33 @@ class Simulator:
         self.total_cost = 0.0  # Cumulative heating cost (€)
         self.duration = timedelta(days=self.loader.data.get("duration_days", 3))
         self.sim_start = self.current_sim_time
+        # Scenario day 0 = midnight of the simulation start (computed once, not per batch)
+        self._day0 = self.current_sim_time.replace(hour=0, minute=0, second=0, microsecond=0)
         self.running = True
+
+        # Exogenous inputs (T_ext, solar gain) tabulated one simulated day at a time
+        self._forcing = None
+        self._forcing_idx = 0
+        # Closed-loop (T_air, T_m, valve) trajectory over the remaining forcing, invalidated by MQTT commands
+        self._trajectory = None
+        self._trajectory_start = 0
+
+        # Metrics payload reused across ticks (fields overwritten in publish_state)
+        self._payload = {
+            "temperature": 0.0,
+            "mass_temperature": 0.0,
+            "external_temperature": 0.0,
+            "power_consumption": 0.0,
+            "solar_power": 0.0,
+            "valve_position": 0.0,
+            "electricity_price": 0.0,
+            "heating_cost_step": 0.0,
+            "heating_cost_cumulative": 0.0,
+            "sim_time": ""
+        }
         
     async def run(self):
+        settings = get_settings()
         async with Client(hostname=settings.MQTT_BROKER_HOST, port=settings.MQTT_PORT, 
                           username=settings.MQTT_USERNAME, password=settings.MQTT_PASSWORD) as client:
             self.client = client
@@ -47,15 +85,24 @@ class Simulator:
             
             # Start listener task in background
             listener_task = asyncio.create_task(self.listen_for_commands())
+            # Physics never awaits the broker: states go through a bounded queue drained by this task
+            publisher_task = asyncio.create_task(self._publisher())
+
+            # Settings are invariant during the run: snapshot them as locals for the hot loop
+            dt_sim = settings.SIM_TIME_STEP # e.g. 60 seconds
+            step = timedelta(seconds=dt_sim)
+            heater_max = settings.SIM_HEATER_MAX_POWER
+            t_min = settings.T_MIN
+            speed = self.speed_factor
+            # We want dt_sim sim seconds = dt_sim / speed_factor real seconds
+            tick_period = float(dt_sim) / speed
+            next_tick = time.monotonic()
 
             # Main Loop
             try:
                 while self.running:
-                    loop_start = time.time()
-                    
                     # 1. Advance Time
-                    dt_sim = settings.SIM_TIME_STEP # e.g. 60 seconds
-                    self.current_sim_time += timedelta(seconds=dt_sim)
+                    self.current_sim_time += step
                     
                     # Check if simulation duration is reached
                     if self.current_sim_time - self.sim_start >= self.duration:
@@ -63,13 +110,15 @@ class Simulator:
                         self.running = False
                         break
                     
-                    # 2. Get External Conditions
-                    hour = self.current_sim_time.hour + self.current_sim_time.minute/60.0
-                    total_days = (self.current_sim_time - datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)).days
-                    
-                    weather = self.loader.get_weather_at(total_days, hour)
-                    T_ext = weather['temperature']
-                    nebulosity = weather['nebulosity']
+                    # 2. Get External Conditions (tabulated per simulated day, see _prepare_forcing)
+                    if self._forcing is None or self._forcing_idx >= len(self._forcing[0]):
+                        self._prepare_forcing(dt_sim)
+                    i = self._forcing_idx
+                    T_ext = float(self._forcing[0][i])
+                    P_sol = float(self._forcing[1][i])
+                    hour = float(self._forcing[2][i])
+                    total_days = int(self._forcing[3][i])
+                    self._forcing_idx += 1
                     
                     # 2b. Get Electricity Tariff
                     pricing = self.loader.get_price_at(total_days, hour)
@@ -78,31 +127,30 @@ class Simulator:
                     
                     # 3. Calculate Powers (for display/logging, logic is inside physics now)
                     # Heating Power (Watts) - purely for logging, physics recalculates this
-                    P_heat_display = (self.valve_pos / 100.0) * settings.SIM_HEATER_MAX_POWER
-                    
-                    # Solar - purely for logging
-                    P_sol = self.physics.calculate_solar_gain(self.current_sim_time, nebulosity)
+                    P_heat_display = (self.valve_pos / 100.0) * heater_max
                     
                     # Internal (Simplified: 0W for now)
                     P_int = 0.0
                     
-                    # 4. Physics Step (ISO 13790)
-                    # Pass previous states and current forcing factors
-                    self.T_int, self.T_m = self.physics.calculate_next_state(
-                        t_air_prev=self.T_int,
-                        t_m_prev=self.T_m,
-                        t_ext=T_ext,
-                        valve_pos=self.valve_pos,
-                        p_sol=P_sol,
-                        p_int=P_int
-                    )
-                    
-                    # 4b. Simple Thermostat Control
+                    # 4. Physics Step (ISO 13790) + 4b. Simple Thermostat Control
                     # Hysteresis: heat ON below T_MIN, OFF above T_MIN + 1°C
-                    if self.T_int < settings.T_MIN:
-                        self.valve_pos = 100.0
-                    elif self.T_int > settings.T_MIN + 1.0:
-                        self.valve_pos = 0.0
+                    # Until an MQTT command moves the valve, the closed loop is deterministic: integrate the
+                    # rest of the forcing day in one compiled pass and consume it tick by tick.
+                    if self._trajectory is None:
+                        self._trajectory = self.physics.simulate_thermostat(
+                            t_m_prev=self.T_m,
+                            valve_pos=self.valve_pos,
+                            t_ext=self._forcing[0][i:],
+                            p_sol=self._forcing[1][i:],
+                            p_int=P_int,
+                            t_on=t_min,
+                            t_off=t_min + 1.0
+                        )
+                        self._trajectory_start = i
+                    k = i - self._trajectory_start
+                    self.T_int = float(self._trajectory[0][k])
+                    self.T_m = float(self._trajectory[1][k])
+                    self.valve_pos = float(self._trajectory[2][k])
                     
                     # 5. Calculate Heating Cost
                     # cost = Power(W) × time(h) × price(€/kWh) / 1000(W→kW)
@@ -110,52 +158,113 @@ class Simulator:
                     self.total_cost += cost_step
                     
                     # 6. Publish State
-                    await self.publish_state(T_ext, P_heat_display, P_sol, elec_price, cost_step, tariff_type)
+                    self.publish_state(T_ext, P_heat_display, P_sol, elec_price, cost_step, tariff_type)
                     
                     # 6. Wait (Real Time)
-                    # We want dt_sim sim seconds = dt_sim / speed_factor real seconds
-                    target_wait = float(dt_sim) / self.speed_factor
-                    elapsed = time.time() - loop_start
-                    parking = target_wait - elapsed
+                    # Absolute deadlines on the monotonic clock: sleep jitter does not accumulate
+                    next_tick += tick_period
+                    parking = next_tick - time.monotonic()
                     
                     if parking > 0:
                         await asyncio.sleep(parking)
+                    else:
+                        # Always yield so the publisher and the command listener keep running
+                        await asyncio.sleep(0)
+                        if parking < -tick_period:
+                            # Fell behind by more than a tick: resync instead of bursting
+                            next_tick = time.monotonic()
+
+                # Let the publisher flush the last states (bounded wait if the broker is stalled)
+                try:
+                    await asyncio.wait_for(self._publish_q.join(), timeout=5.0)
+                except asyncio.TimeoutError:
+                    logger.warning(f"{self._publish_q.qsize()} MQTT messages not published before shutdown")
             except asyncio.CancelledError:
                 logger.info("Simulation loop cancelled")
             finally:
                 listener_task.cancel()
+                publisher_task.cancel()
+
+    def _prepare_forcing(self, dt_sim: int):
+        """
+        Tabulate T_ext and solar gain for the next simulated day in one vectorized pass.
+        """
+        n_steps = max(1, int(86400 // dt_sim))
+        seconds = (self.current_sim_time - self._day0).total_seconds() + np.arange(n_steps) * dt_sim
+        day_index = (seconds // 86400).astype(int)
+        hour = (seconds % 86400 // 60) / 60.0 # Minute resolution, like current_sim_time.hour/minute
+
+        t_ext, nebulosity = self.loader.get_weather_series(day_index, hour)
+        p_sol = self.physics.calculate_solar_gain_batch(hour, nebulosity)
+        self._forcing = (t_ext, p_sol, hour, day_index)
+        self._forcing_idx = 0
+        self._trajectory = None
+
+    def _enqueue(self, topic: str, payload):
+        """Queue a message for the publisher, dropping the oldest one if the broker is lagging."""
+        if self._publish_q.full():
+            self._publish_q.get_nowait()
+            self._publish_q.task_done()
+        self._publish_q.put_nowait((topic, payload))
+
+    async def _publisher(self):
+        while True:
+            topic, payload = await self._publish_q.get()
+            try:
+                await self.client.publish(topic, payload, qos=0)
+            except Exception as e:
+                logger.error(f"MQTT Publish Error: {e}")
+            finally:
+                self._publish_q.task_done()
+
+    def publish_state(self, T_ext: float, P_heat: float, P_sol: float,
+                      elec_price: float, cost_step: float, tariff_type: str):
+        sim_time_iso = self.current_sim_time.isoformat() # Formatted once, used by both topics
 
-    async def publish_state(self, T_ext: float, P_heat: float, P_sol: float,
-                           elec_price: float, cost_step: float, tariff_type: str):
         # 1. Clock Sync
-        await self.client.publish(settings.MQTT_TOPIC_CLOCK, self.current_sim_time.isoformat())
+        # Metrics already carry sim_time, so the dedicated clock topic is only refreshed every N ticks
+        if self._tick % self.clock_every == 0:
+            self._enqueue(self.topic_clock, sim_time_iso)
+        self._tick += 1
         
         # 2. Metrics
         # Add noise to temperature reading
-        noise = random.gauss(0, settings.SIM_SENSOR_NOISE_STD)
+        if self._noise_idx >= len(self._noise_pool):
+            self._noise_pool = self._rng.normal(0.0, self.noise_std, NOISE_POOL_SIZE)
+            self._noise_idx = 0
+        noise = float(self._noise_pool[self._noise_idx])
+        self._noise_idx += 1
         T_measured = self.T_int + noise
         
-        payload = {
-            "temperature": round(T_measured, 2),
-            "mass_temperature": round(self.T_m, 2),
-            "external_temperature": round(T_ext, 2),
-            "power_consumption": round(P_heat, 2),
-            "solar_power": round(P_sol, 2),
-            "valve_position": self.valve_pos,
-            "electricity_price": round(elec_price, 4),
-            "heating_cost_step": round(cost_step, 6),
-            "heating_cost_cumulative": round(self.total_cost, 4),
-            "sim_time": self.current_sim_time.isoformat()
-        }
-        await self.client.publish(settings.MQTT_TOPIC_METRICS, json.dumps(payload))
-        logger.info(f"Sim {self.current_sim_time.strftime('%H:%M')} | T={self.T_int:.1f} | Heat={P_heat:.0f}W | {tariff_type} {elec_price:.4f}€ | Total={self.total_cost:.4f}€")
+        payload = self._payload
+        payload["temperature"] = round(T_measured, 2)
+        payload["mass_temperature"] = round(self.T_m, 2)
+        payload["external_temperature"] = round(T_ext, 2)
+        payload["power_consumption"] = round(P_heat, 2)
+        payload["solar_power"] = round(P_sol, 2)
+        payload["valve_position"] = self.valve_pos
+        payload["electricity_price"] = round(elec_price, 4)
+        payload["heating_cost_step"] = round(cost_step, 6)
+        payload["heating_cost_cumulative"] = round(self.total_cost, 4)
+        payload["sim_time"] = sim_time_iso
+        self._enqueue(self.topic_metrics, orjson.dumps(payload))
+        if logger.isEnabledFor(logging.INFO):
+            t = self.current_sim_time
+            logger.info(f"Sim {t.hour:02d}:{t.minute:02d} | T={self.T_int:.1f} | Heat={P_heat:.0f}W | {tariff_type} {elec_price:.4f}€ | Total={self.total_cost:.4f}€")
 
     async def listen_for_commands(self):
         async for message in self.client.messages:
             try:
-                payload = json.loads(message.payload.decode())
-                if "valve_position" in payload:
+                # orjson parses the raw bytes directly (no intermediate decode)
+                payload = orjson.loads(message.payload)
+                if isinstance(payload, (int, float)) and not isinstance(payload, bool):
+                    # Bare numeric payload (e.g. b"50"): valve position in %
+                    self.valve_pos = float(payload)
+                    self._trajectory = None
+                    logger.info(f"Valve updated: {self.valve_pos}%")
+                elif "valve_position" in payload:
                     self.valve_pos = float(payload["valve_position"])
+                    self._trajectory = None
                     logger.info(f"Valve updated: {self.valve_pos}%")
             except Exception as e:
                 logger.error(f"MQTT Error: {e}")
@@ -1,8 +1,8 @@
 import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-import json
 from app.config import settings
 from app.services.mqtt_service import MQTTService
 from app.services.influx_service import InfluxService
@@ -17,13 +17,16 @@ logger = logging.getLogger(__name__)
 # Initialize Services
 influx_service = InfluxService()
 mqtt_service = MQTTService()
-mpc_service = MPCService()
-
-COMMAND_TOPIC = settings.MQTT_TOPIC_COMMAND.replace('+', 'chambre')
+# Dedicated solver thread: GEKKO solves never compete with the default executor used by other tasks
+_mpc_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mpc")
+mpc_service = MPCService(executor=_mpc_pool)
 
 # --- Callbacks for MQTT ---
 async def handle_sensor_data(location: str, data: dict, sim_time):
-    await influx_service.write_data(
+    if sim_time is not None:
+        # Metrics carry the simulated time on every tick: keep the MPC clock in sync between clock messages
+        mpc_service.update_time(data["sim_time"])
+    await influx_service.enqueue(
         measurement="sensors",
         tags={"location": location},
         fields=data,
@@ -31,7 +34,7 @@ async def handle_sensor_data(location: str, data: dict, sim_time):
     )
 
 async def handle_valve_set(location: str, data: dict):
-    await influx_service.write_data(
+    await influx_service.enqueue(
         measurement="actuators",
         tags={"location": location, "type": "valve"},
         fields=data
@@ -49,6 +52,10 @@ mqtt_service.on_clock_sync = handle_clock_sync
 scheduler = AsyncIOScheduler()
 
 async def run_mpc_job():
+    if not mpc_service.is_auto_mode:
+        # optimize() would skip anyway: avoid the InfluxDB round-trip for t_init
+        logger.info("MPC is in MANUAL mode. Skipping scheduled job.")
+        return
     logger.info("Running scheduled MPC job...")
     
     t_init = await influx_service.get_latest_data(measurement="sensors", location="chambre", field="temperature")
@@ -58,24 +65,26 @@ async def run_mpc_job():
         
     result = await mpc_service.optimize(t_init)
     if result and "valve_position" in result:
-        payload = json.dumps(result)
         if getattr(mqtt_service, 'client', None):
-            await mqtt_service.client.publish(COMMAND_TOPIC, payload) 
-            logger.info(f"Published decision: {COMMAND_TOPIC} -> {payload}")
+            await mqtt_service.publish_command(result)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan (startup/shutdown)."""
     logger.info("Starting Azru...")
+    influx_service.start()
     task = asyncio.create_task(mqtt_service.start())
     
-    scheduler.add_job(run_mpc_job, 'interval', minutes=15)
+    # A late or overrunning solve must not pile up backlogged runs competing for the solver
+    scheduler.add_job(run_mpc_job, 'interval', minutes=15, coalesce=True, max_instances=1, misfire_grace_time=60)
     scheduler.start()
     
     yield
     
     task.cancel()
     scheduler.shutdown()
+    _mpc_pool.shutdown(wait=False, cancel_futures=True)
+    await mpc_service.aclose()
     await influx_service.close()
     logger.info("Services stopped.")
 
@@ -93,6 +102,9 @@ class ModeControlRequest(BaseModel):
 @app.post("/force-optimization")
 async def force_optimization():
     """Trigger MPC optimization manually and publish to MQTT."""
+    if not mpc_service.is_auto_mode:
+        return {"status": "skipped", "reason": "Manual Mode Active"}
+
     t_init = await influx_service.get_latest_data(measurement="sensors", location="chambre", field="temperature")
     if t_init is None:
         logger.warning("Could not fetch temperature from InfluxDB, using fallback: 20.0 C")
@@ -103,10 +115,8 @@ async def force_optimization():
         return {"status": "skipped", "reason": "Manual Mode Active"}
     
     if result and "valve_position" in result:
-        payload = json.dumps(result)
         if getattr(mqtt_service, 'client', None):
-            await mqtt_service.client.publish(COMMAND_TOPIC, payload) 
-            logger.info(f"Published decision: {COMMAND_TOPIC} -> {payload}")
+            await mqtt_service.publish_command(result)
         
     return result
 
@@ -116,15 +126,14 @@ async def manual_valve_control(request: ValveControlRequest):
     mpc_service.set_auto_mode(False)
     
     sim_time = mpc_service.current_time.isoformat()
-    payload = json.dumps({
+    payload = {
         "valve_position": request.valve_position, 
         "source": "manual",
         "sim_time": sim_time
-    })
+    }
     
     if getattr(mqtt_service, 'client', None):
-        await mqtt_service.client.publish(COMMAND_TOPIC, payload)
-        logger.info(f"Manual Command: {COMMAND_TOPIC} -> {payload}")
+        await mqtt_service.publish_command(payload)
         return {"status": "success", "mode": "manual", "valve_position": request.valve_position}
     else:
         return {"status": "error", "message": "MQTT Client not connected"}
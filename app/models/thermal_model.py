@@ -1,20 +1,51 @@
+import math
+import numpy as np
 from app.config import settings
 
 class ThermalModel:
     """
     Simple R1C1 Thermal Model.
-    Equation: T(t+1) = T(t) + (dt / C) * ((T_ext - T(t)) / R + P_heat)
+    Equation: C * dT/dt = UA * (T_ext - T) + P_heat, with UA = area / R
+    Integrated exactly over a step (constant inputs):
+    T(t+dt) = T_eq + (T(t) - T_eq) * exp(-dt / tau), T_eq = T_ext + P_heat / UA, tau = C / UA
     """
     def __init__(self):
         self.R = settings.SIM_ROOM_R
         self.C = settings.SIM_ROOM_C
         self.area = settings.AREA
+        self.UA = self.area / self.R  # Conductance totale (W/K)
+        self.tau = self.C / self.UA  # Constante de temps (s)
+        # exp(-dt/tau) only depends on dt: precompute it for the simulation step
+        self._decay_cache = {settings.SIM_TIME_STEP: math.exp(-settings.SIM_TIME_STEP / self.tau)}
+
+    def decay(self, dt: float) -> float:
+        """Free-response factor exp(-dt / tau) of the room temperature over a step of dt seconds (cached per dt)."""
+        decay = self._decay_cache.get(dt)
+        if decay is None:
+            decay = self._decay_cache[dt] = math.exp(-dt / self.tau)
+        return decay
 
     def predict_next_temperature(self, T_in: float, T_ext: float, Power: float, dt: float = 900) -> float:
         """
         Predict temperature at t + dt.
-        dt: time step in seconds (default 15 min = 900s)
+        dt: time step in seconds (default 15 min = 900s), stable for any dt
         Power: Heating power in Watts
         """
-        dT_dt = ((T_ext - T_in) / (self.R * self.area)) + (Power / self.C)
-        return T_in + dT_dt * dt
+        T_eq = T_ext + Power / self.UA
+        return T_eq + (T_in - T_eq) * self.decay(dt)
+
+    def predict_trajectory(self, T0: float, T_ext: np.ndarray, P: np.ndarray, dt: float = 900) -> np.ndarray:
+        """
+        Roll predict_next_temperature over a horizon.
+        T_ext, P: exterior temperature and heating power for each of the N steps
+        Returns the N+1 temperatures, starting with T0.
+        """
+        decay = self.decay(dt)
+        # T(t+dt) = decay * T(t) + (1 - decay) * T_eq: only the recurrence itself is sequential
+        gain = (1.0 - decay) * (np.asarray(T_ext, dtype=float) + np.asarray(P, dtype=float) / self.UA)
+        T = np.empty(len(gain) + 1)
+        T[0] = t = T0
+        for i, g in enumerate(gain.tolist(), start=1):
+            t = decay * t + g
+            T[i] = t
+        return T
@@ -1,87 +1,274 @@
 from typing import Optional
+import asyncio
 import logging
+import time
+import math
+from datetime import timedelta, timezone
 from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
-from influxdb_client import InfluxDBClient, Point
-from datetime import datetime
+from influxdb_client import Point
+from influxdb_client.domain.write_precision import WritePrecision
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+BATCH_MAX_POINTS = 5000
+LATEST_CACHE_TTL = 60.0 # s
+
+# Line protocol escaping (same rules as influxdb_client's Point)
+_ESCAPE_MEASUREMENT = str.maketrans({",": r"\,", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"})
+_ESCAPE_KEY = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"})
+_ESCAPE_STRING = str.maketrans({'"': r'\"', "\\": r"\\"})
+
+# Constant Flux template: values are bound as query params (no string interpolation, no injection from MQTT topics).
+# The client declares each param as a top-level `option <name> = ...` in extern: referenced as bare identifiers.
+LATEST_QUERY = '''
+from(bucket: _bucket)
+    |> range(start: _start)
+    |> filter(fn: (r) => r["_measurement"] == _meas)
+    |> filter(fn: (r) => r["location"] == _loc)
+    |> filter(fn: (r) => r["_field"] == _field)
+    |> last()
+'''
+# The latest point is almost always recent: scan the last hour before the full 30 days
+LATEST_QUERY_RANGES = (timedelta(hours=-1), timedelta(days=-30))
+
 class InfluxService:
     def __init__(self):
         self.url = settings.INFLUXDB_URL
         self.token = settings.INFLUXDB_TOKEN
         self.org = settings.INFLUXDB_ORG
         self.async_client: Optional[InfluxDBClientAsync] = None
+        # APIs bound to async_client, created once (see _get_write_api/_get_query_api)
+        self._write_api = None
+        self._query_api = None
+        # Background batch writer (see start/enqueue)
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # (measurement, tag items) -> escaped "measurement,tag=value" line prefix (see _build_line)
+        self._line_prefixes: dict[tuple, str] = {}
+        # (measurement, location, field) -> (value, monotonic time), fed by writes and queries
+        self._latest_cache: dict[tuple, tuple[float, float]] = {}
 
     def _get_async_client(self):
         if self.async_client is None:
             self.async_client = InfluxDBClientAsync(
                 url=self.url,
                 token=self.token,
-                org=self.org
+                org=self.org,
+                enable_gzip=True
             )
         return self.async_client
 
+    def _get_write_api(self):
+        if self._write_api is None:
+            self._write_api = self._get_async_client().write_api()
+        return self._write_api
+
+    def _get_query_api(self):
+        if self._query_api is None:
+            self._query_api = self._get_async_client().query_api()
+        return self._query_api
+
+    @staticmethod
+    def _build_point(measurement: str, tags: dict, fields: dict, timestamp=None) -> Point:
+        # Second precision: sensors sample at best every second, shorter lines and better TSM compression.
+        # Set even without a timestamp so every point of a batch shares one precision (one HTTP request).
+        point = Point(measurement).time(timestamp or None, write_precision=WritePrecision.S)
+        for tag, value in tags.items():
+            point.tag(tag, value)
+        for field, value in fields.items():
+            point.field(field, value)
+        return point
+
+    def _build_line(self, measurement: str, tags: dict, fields: dict, timestamp=None) -> Optional[str]:
+        """
+        Line protocol equivalent of _build_point for the hot write path: the escaped measurement+tags
+        prefix is built once per series, then only fields and timestamp are formatted.
+        Returns None when no field is writable (like Point's empty line): InfluxDB rejects the whole
+        request body if it contains a line without fields.
+        """
+        key = (measurement, *tags.items())
+        prefix = self._line_prefixes.get(key)
+        if prefix is None:
+            prefix = measurement.translate(_ESCAPE_MEASUREMENT)
+            for tag, value in sorted(tags.items()): # Sorted tag keys, as recommended by InfluxDB
+                value = str(value).translate(_ESCAPE_KEY)
+                if value.endswith("\\"):
+                    value += " "
+                prefix += f",{str(tag).translate(_ESCAPE_KEY)}={value}"
+            self._line_prefixes[key] = prefix
+
+        parts = []
+        for field, value in fields.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+            elif isinstance(value, int):
+                value = f"{value}i"
+            elif isinstance(value, float):
+                if not math.isfinite(value):
+                    continue
+                value = repr(value)
+                if value.endswith(".0"):
+                    value = value[:-2]
+            elif isinstance(value, str):
+                value = '"' + value.translate(_ESCAPE_STRING) + '"'
+            else:
+                raise ValueError(f'Type: "{type(value)}" of field: "{field}" is not supported.')
+            parts.append(f"{str(field).translate(_ESCAPE_KEY)}={value}")
+        if not parts:
+            return None
+        line = f"{prefix} {','.join(parts)}"
+
+        if isinstance(timestamp, int):
+            line += f" {timestamp}" # Already epoch seconds
+        elif timestamp:
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc) # Naive = UTC, like Point
+            line += f" {int(timestamp.timestamp())}"
+        return line
+
+    async def _write_records(self, records):
+        """Write one or a list of Points / line protocol strings (second precision) in a single HTTP request."""
+        write_api = self._get_write_api()
+        await write_api.write(bucket=settings.INFLUXDB_BUCKET, org=settings.INFLUXDB_ORG, record=records,
+                              write_precision=WritePrecision.S)
+
     async def write_data(self, measurement: str, tags: dict, fields: dict, timestamp=None):
         """Write a data point to InfluxDB asynchronously."""
         try:
-            point = Point(measurement)
-            if timestamp:
-                point.time(timestamp)
-            for tag, value in tags.items():
-                point.tag(tag, value)
-            for field, value in fields.items():
-                point.field(field, value)
-            
-            client = self._get_async_client()
-            write_api = client.write_api()
-            await write_api.write(bucket=settings.INFLUXDB_BUCKET, org=settings.INFLUXDB_ORG, record=point)
+            point = self._build_point(measurement, tags, fields, timestamp)
+            await self._write_records(point)
+            self._remember_latest(measurement, tags, fields)
             logger.debug(f"Written to InfluxDB: {measurement} {tags} {fields}")
         except Exception as e:
             logger.error(f"InfluxDB Write Error: {e}")
 
+    async def write_batch(self, points: list[dict]):
+        """
+        Write many points in a single HTTP request.
+        points: dicts in influxdb_client's format {"measurement", "tags", "fields", "time"}, time being a
+        datetime or integer epoch seconds
+        """
+        if not points:
+            return
+        try:
+            lines = [self._build_line(p["measurement"], p.get("tags", {}), p["fields"], p.get("time")) for p in points]
+            lines = [line for line in lines if line is not None]
+            if not lines:
+                return
+            await self._write_records(lines)
+            logger.debug(f"Written batch of {len(lines)} points to InfluxDB")
+        except Exception as e:
+            logger.error(f"InfluxDB Batch Write Error ({len(points)} points): {e}")
+
+    def start(self):
+        """Start the background batch writer. Must be called from the running event loop."""
+        if self._writer_task is None:
+            self._queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._batch_writer())
+
+    async def enqueue(self, measurement: str, tags: dict, fields: dict, timestamp=None):
+        """
+        Queue a data point for the background batch writer (non-blocking, the writer is started on first use).
+        """
+        self.start()
+        try:
+            line = self._build_line(measurement, tags, fields, timestamp)
+        except ValueError as e:
+            # Unsupported field value (e.g. nested object in a sensor payload): drop this record only
+            logger.error(f"InfluxDB Write Error: {e}")
+            return
+        if line is None:
+            logger.debug(f"No writable field, point skipped: {measurement} {tags} {fields}")
+            return
+        self._queue.put_nowait(line)
+        self._remember_latest(measurement, tags, fields)
+
+    async def _batch_writer(self):
+        """Drain the queue into batches: everything queued during a write goes out in the next request."""
+        stopping = False
+        while not stopping:
+            points = [await self._queue.get()]
+            while len(points) < BATCH_MAX_POINTS and not self._queue.empty():
+                points.append(self._queue.get_nowait())
+            if None in points:
+                # Shutdown sentinel (see close): flush what was queued before it and stop
+                stopping = True
+                points = [p for p in points if p is not None]
+            if not points:
+                continue
+            try:
+                await self._write_records(points)
+                logger.debug(f"Written batch of {len(points)} points to InfluxDB")
+            except Exception as e:
+                logger.error(f"InfluxDB Batch Write Error ({len(points)} points): {e}")
+
+    def _remember_latest(self, measurement: str, tags: dict, fields: dict):
+        """Keep the numeric fields just written as the latest known values of their series."""
+        location = tags.get("location")
+        if location is None:
+            return
+        now = time.monotonic()
+        for field, value in fields.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self._latest_cache[(measurement, location, field)] = (float(value), now)
+
     async def get_latest_data(self, measurement: str, location: str, field: str) -> Optional[float]:
         """Get the last known value for a specific field asynchronously."""
-        query = f'''
-        from(bucket: "{settings.INFLUXDB_BUCKET}")
-            |> range(start: -30d)
-            |> filter(fn: (r) => r["_measurement"] == "{measurement}")
-            |> filter(fn: (r) => r["location"] == "{location}")
-            |> filter(fn: (r) => r["_field"] == "{field}")
-            |> last()
-        '''
+        key = (measurement, location, field)
+        cached = self._latest_cache.get(key)
+        if cached is not None and time.monotonic() - cached[1] < LATEST_CACHE_TTL:
+            return cached[0]
+
         try:
-            client = self._get_async_client()
-            query_api = client.query_api()
-            result = await query_api.query(org=settings.INFLUXDB_ORG, query=query)
-            result = await query_api.query(org=settings.INFLUXDB_ORG, query=query)
-            if result:
-                for table in result:
-                    for record in table.records:
-                        return float(record.get_value())
+            query_api = self._get_query_api()
+            for range_start in LATEST_QUERY_RANGES:
+                params = {
+                    "_bucket": settings.INFLUXDB_BUCKET,
+                    "_start": range_start,
+                    "_meas": measurement,
+                    "_loc": location,
+                    "_field": field,
+                }
+                result = await query_api.query(query=LATEST_QUERY, org=settings.INFLUXDB_ORG, params=params)
+                if result:
+                    for table in result:
+                        for record in table.records:
+                            value = float(record.get_value())
+                            self._latest_cache[key] = (value, time.monotonic())
+                            return value
             return None
         except Exception as e:
             logger.error(f"InfluxDB Read Error: {e}")
             return None
             
-    def clear_database(self, start="1970-01-01T00:00:00Z", stop="2100-01-01T00:00:00Z"):
+    async def clear_database(self, start="1970-01-01T00:00:00Z", stop="2100-01-01T00:00:00Z"):
         """Delete all data from the bucket between start and stop times."""
         try:
             logger.info(f"Clearing InfluxDB bucket '{settings.INFLUXDB_BUCKET}' from {start} to {stop}")
-            with InfluxDBClient(url=self.url, token=self.token, org=self.org) as sync_client:
-                delete_api = sync_client.delete_api()
-                delete_api.delete(
-                    start, stop,
-                    predicate="",
-                    bucket=settings.INFLUXDB_BUCKET,
-                    org=settings.INFLUXDB_ORG
-                )
+            # Same async client (and connection pool) as reads/writes, no extra sync client per call
+            delete_api = self._get_async_client().delete_api()
+            await delete_api.delete(
+                start, stop,
+                predicate="",
+                bucket=settings.INFLUXDB_BUCKET,
+                org=settings.INFLUXDB_ORG
+            )
             logger.info("Database cleared successfully.")
         except Exception as e:
             logger.error(f"InfluxDB Delete Error: {e}")
 
     async def close(self):
+        if self._writer_task is not None:
+            # Flush pending points before closing the client
+            self._queue.put_nowait(None)
+            await self._writer_task
+            self._writer_task = None
+            self._queue = None
         if self.async_client:
             await self.async_client.close()
             self.async_client = None
+            self._write_api = None
+            self._query_api = None
@@ -1,23 +1,69 @@
 import logging
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
 from typing import Optional
+from concurrent.futures import Executor
 import httpx
 import asyncio
 from gekko import GEKKO
+try:
+    import osqp
+    import scipy.sparse as sp
+except ImportError:
+    # GEKKO/APOPT only
+    osqp = None
 from app.config import settings
 from app.models.thermal_model import ThermalModel
 
 logger = logging.getLogger(__name__)
 
+# Tarifs EDF Tempo 2024-2025 (environ, en €/kWh)
+# HP: 6h-22h, HC: 22h-6h
+TEMPO_TARIFS = {
+    "Bleu": {"HC": 0.1296, "HP": 0.1609},
+    "Blanc": {"HC": 0.1486, "HP": 0.1894},
+    "Rouge": {"HC": 0.1568, "HP": 0.7562},
+    "Inconnu": {"HC": 0.15, "HP": 0.25} # Fallback
+}
+TEMPO_RETRY_DELAY = 300.0 # s between two fetches of a color not (yet) available
+DAILY_PULSATION = 2 * np.pi / 24 # rad/h, cycle journalier de la météo simulée
+
 class MPCService:
-    def __init__(self):
+    def __init__(self, executor: Optional[Executor] = None):
         self.model = ThermalModel()
+        # Executor running the blocking solves (None = asyncio's default pool)
+        self.executor = executor
         self.dt = settings.SIM_TIME_STEP  # Rendu dynamique via config.py (ex: 3600s = 1h)
-        self.horizon = int(24 * 3600 / self.dt)  # Horizon prédictif de 24h
+        # Horizon prédictif de 24h sur une grille non uniforme : le premier pas vaut le cycle du contrôleur
+        # (seule action appliquée), puis les pas doublent jusqu'à 24h (queue d'horizon grossière, peu de noeuds)
+        grid = [0, self.dt]
+        while grid[-1] < 24 * 3600:
+            grid.append(min(2 * grid[-1], 24 * 3600))
+        self.time_grid = np.array(grid, dtype=float)
+        self.horizon = len(self.time_grid)  # Nombre de noeuds (forecasts are sampled on time_grid)
+        # Objective weight of each node: length of the interval ending at it, in controller steps
+        self._node_weights = np.concatenate([[1.0], np.diff(self.time_grid) / self.dt])
         self.current_time = datetime.now()
+        self._last_iso = None # Last string parsed by update_time
         self.is_auto_mode = True
+        # Mock weather forecast only depends on the start hour: one read-only row per hour, built once
+        t = self.time_grid / 3600
+        hours = np.arange(24).reshape(-1, 1)
+        # T_ext varies between 5°C (night) and 15°C (day)
+        # float32: forecasts are far coarser than 7 digits, and GEKKO serializes fewer bytes to its model files
+        self._weather_forecasts = (10 + 5 * np.sin(DAILY_PULSATION * (t + hours - 8))).astype(np.float32)
+        self._weather_forecasts.setflags(write=False)
+        # Convex QP (OSQP) built lazily by _build_qp, persistent GEKKO model used as fallback
+        self._qp = None
+        self._m = None
+        self._solve_lock = asyncio.Lock()
+        # Tempo colors by date, and price vectors by (colors, start second of day)
+        self._tempo_cache: dict[date, str] = {}
+        self._tempo_retry_at = 0.0
+        self._price_vec_cache: dict[tuple, np.ndarray] = {}
+        # Shared Tempo API client, created on first use (see _get_http_client/aclose)
+        self._http_client: Optional[httpx.AsyncClient] = None
 
     def set_auto_mode(self, enabled: bool):
         """Enable or disable MPC automatic control."""
@@ -26,8 +72,12 @@ class MPCService:
 
     def update_time(self, iso_time: str):
         """Update internal time from simulation clock."""
+        # Clock and metrics messages repeat the same timestamp: only parse when it changes
+        if iso_time == self._last_iso:
+            return
         try:
             self.current_time = datetime.fromisoformat(iso_time)
+            self._last_iso = iso_time
             logger.debug(f"MPC Time updated: {self.current_time}")
         except ValueError as e:
             logger.error(f"Failed to parse time {iso_time}: {e}")
@@ -37,13 +87,20 @@ class MPCService:
         if start_time is None:
              start_time = self.current_time
              
-        # Create a time range for the next 24h
-        t = np.linspace(0, 24, self.horizon)
-        # T_ext varies between 5°C (night) and 15°C (day)
-        # Shift sin wave based on start_time hour
-        start_hour = start_time.hour
-        T_ext = 10 + 5 * np.sin(2 * np.pi * (t + start_hour - 8) / 24)
-        return T_ext
+        # Sin wave shifted on start_time hour (precomputed in __init__)
+        return self._weather_forecasts[start_time.hour]
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        # Client partagé : la connexion (et la poignée de main TLS) à l'API Tempo est réutilisée entre deux appels
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(timeout=5.0)
+        return self._http_client
+
+    async def aclose(self):
+        """Close the shared HTTP client."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
 
     async def get_tempo_electricity_prices(self, start_time: Optional[datetime] = None):
         """
@@ -53,57 +110,259 @@ class MPCService:
         if start_time is None:
              start_time = self.current_time
 
-        # Tarifs EDF Tempo 2024-2025 (environ, en €/kWh)
-        # HP: 6h-22h, HC: 22h-6h
-        TARIFS = {
-            "Bleu": {"HC": 0.1296, "HP": 0.1609},
-            "Blanc": {"HC": 0.1486, "HP": 0.1894},
-            "Rouge": {"HC": 0.1568, "HP": 0.7562},
-            "Inconnu": {"HC": 0.15, "HP": 0.25} # Fallback
-        }
-
-        # 1. Récupération des couleurs du jour et du lendemain
-        couleur_aujourdhui = "Inconnu"
-        couleur_demain = "Inconnu"
+        # 1. Récupération des couleurs du jour et du lendemain (mises en cache par date : une couleur publiée ne change plus)
+        today = date.today()
+        tomorrow = today + timedelta(days=1)
+        cache = self._tempo_cache
+        if (today not in cache or tomorrow not in cache) and time.monotonic() >= self._tempo_retry_at:
+            for day in [d for d in cache if d < today]:
+                del cache[day]
+            try:
+                # API non officielle très fiable, mais appel non-bloquant
+                # Les deux jours manquants sont demandés en parallèle
+                client = self._get_http_client()
+                missing = [(day, endpoint) for day, endpoint in ((today, "today"), (tomorrow, "tomorrow")) if day not in cache]
+                responses = await asyncio.gather(
+                    *(client.get(f"https://www.api-couleur-tempo.fr/api/jourTempo/{endpoint}") for _, endpoint in missing),
+                    return_exceptions=True
+                )
+                for (day, endpoint), res in zip(missing, responses):
+                    if isinstance(res, Exception):
+                        logger.error(f"Erreur lors de la récupération de la couleur Tempo ({endpoint}): {res}")
+                        continue
+                    if res.status_code == 200:
+                        couleur = res.json().get("libCouleur", "Inconnu")
+                        if couleur in TEMPO_TARIFS and couleur != "Inconnu":
+                            cache[day] = couleur
+            except Exception as e:
+                logger.error(f"Erreur lors de la récupération des couleurs Tempo: {e}")
+            if today not in cache or tomorrow not in cache:
+                # Couleur pas encore publiée (demain, avant ~11h) ou API injoignable : pas de nouvel essai avant un délai
+                self._tempo_retry_at = time.monotonic() + TEMPO_RETRY_DELAY
+            logger.info(f"Couleurs Tempo - Aujourd'hui: {cache.get(today, 'Inconnu')}, Demain: {cache.get(tomorrow, 'Inconnu')}")
+
+        couleur_aujourdhui = cache.get(today, "Inconnu")
+        couleur_demain = cache.get(tomorrow, "Inconnu")
+
+        # 2. Construction du vecteur de prix sur l'horizon (vectorisée, mise en cache par couleurs + heure de départ)
+        start_second = start_time.hour * 3600 + start_time.minute * 60 + start_time.second
+        key = (couleur_aujourdhui, couleur_demain, start_second)
+        prices = self._price_vec_cache.get(key)
+        if prices is None:
+            seconds = start_second + self.time_grid.astype(np.int64)
+            # Les Heures Pleines Tempo sont de 6h à 22h
+            hours = (seconds // 3600) % 24
+            is_hp = (hours >= 6) & (hours < 22)
+            # Pour simplifier sur 24h : jour 0 = aujourd'hui, au-delà = demain
+            is_today = seconds < 86400
+            tarif_jour = TEMPO_TARIFS[couleur_aujourdhui]
+            tarif_demain = TEMPO_TARIFS[couleur_demain]
+            prices = np.where(
+                is_today,
+                np.where(is_hp, tarif_jour["HP"], tarif_jour["HC"]),
+                np.where(is_hp, tarif_demain["HP"], tarif_demain["HC"]),
+            ).astype(np.float32)
+            prices.setflags(write=False)
+            self._price_vec_cache[key] = prices
+
+        return prices
+
+    def _build_model(self):
+        """Build the GEKKO MPC problem once; later runs only update its parameters and initial state."""
+        m = GEKKO(remote=False) # Attempt local solve first
+        m.time = self.time_grid
+
+        # Variables
+        # Indoor Temperature (Large bounds to prevent infeasibility during transient high temps)
+        Ti = m.Var(value=settings.SIM_INITIAL_TEMP, lb=-20, ub=60, name='Ti')
+        # Heating Power (Control Variable)
+        P_heat = m.MV(value=0, lb=0, ub=settings.SIM_HEATER_MAX_POWER, name='P_heat')
+        P_heat.STATUS = 1  # Allow optimizer to modify
+        P_heat.DCOST = 0   # No cost for changing setting
+
+        # Parameters (values set before each solve)
+        Text = m.Param(value=np.zeros(self.horizon), name='Text')
+        Price = m.Param(value=np.zeros(self.horizon), name='Price')
+        # Time weight of each node (non-uniform grid): a long tail interval costs more than one controller step
+        W = m.Param(value=self._node_weights, name='W')
         
-        try:
-            # API non officielle très fiable, mais appel non-bloquant
-            async with httpx.AsyncClient() as client:
-                res_today = await client.get("https://www.api-couleur-tempo.fr/api/jourTempo/today", timeout=5.0)
-                if res_today.status_code == 200:
-                    couleur_aujourdhui = res_today.json().get("libCouleur", "Inconnu")
-                    
-                res_tomorrow = await client.get("https://www.api-couleur-tempo.fr/api/jourTempo/tomorrow", timeout=5.0)
-                if res_tomorrow.status_code == 200:
-                    couleur_demain = res_tomorrow.json().get("libCouleur", "Inconnu")
-        except Exception as e:
-            logger.error(f"Erreur lors de la récupération des couleurs Tempo: {e}")
+        # Constants
+        R = settings.SIM_ROOM_R
+        C = settings.SIM_ROOM_C
+        Area = settings.AREA
+        Tmin = settings.T_MIN
+        Tmax = settings.T_MAX
+        Rho = settings.RHO
 
-        logger.info(f"Couleurs Tempo - Aujourd'hui: {couleur_aujourdhui}, Demain: {couleur_demain}")
+        # Equation of State (Discretized)
+        # Thermodynamique: dT/dt = (Text - Ti)*Area/(R*C) + P/C
+        m.Equation(Ti.dt() == (Text - Ti) * Area / (R * C) + P_heat / C)
 
-        # 2. Construction du vecteur de prix sur l'horizon
-        prices = np.zeros(self.horizon)
+        # Objective Function
+        # Minimize Cost + Penalty for discomfort
+        # Discomfort = Rho * (max(0, Tmin - Ti)**2) + Rho * (max(0, Ti - Tmax)**2)
+        
+        # Variables de relaxation (slack) pour confort violation min et max
+        violation_min = m.Var(value=0, lb=0)
+        violation_max = m.Var(value=0, lb=0)
+        
+        m.Equation(violation_min >= Tmin - Ti)
+        m.Equation(violation_max >= Ti - Tmax)
+        
+        # Pénalité asymétrique: chauffer pour rien coûte cher, donc surchauffe très réprimée
+        penalty_weight = Rho * 10 
         
-        current_step_time = start_time
-        for i in range(self.horizon):
-            # Déterminer si on est sur aujourd'hui ou demain (ou après)
-            # Pour simplifier sur 24h, on regarde juste la date
-            if current_step_time.date() == start_time.date():
-                couleur_jour = couleur_aujourdhui
-            else:
-                couleur_jour = couleur_demain
+        m.Obj(W * (Price * P_heat * 1e-4 + Rho * violation_min**2 + penalty_weight * violation_max**2))
 
-            # Les Heures Pleines Tempo sont de 6h à 22h
-            is_hp = 6 <= current_step_time.hour < 22
-            
-            # Récupération du tarif applicable
-            tarif_jour = TARIFS.get(couleur_jour, TARIFS["Inconnu"])
-            prices[i] = tarif_jour["HP"] if is_hp else tarif_jour["HC"]
+        m.options.IMODE = 6 # Control
+        m.options.NODES = 3 # Collocation nodes
+        # APOPT (active set) suits this small QP-shaped problem; the local IPOPT build is not always available
+        m.options.SOLVER = 1
+        m.options.MAX_ITER = 50 # Warm-started solves converge in < 20 iterations: cap the worst case
+        m.options.REDUCE = 3 # Pré-traitement du modèle (élimination des équations linéaires triviales)
+        # Warm start: the previous solution, unshifted, is the initial guess. TIME_SHIFT moves node k+1 onto node k,
+        # which on the doubling grid is a shift of 2^(k-1)*dt, not the elapsed time: disabled
+        m.options.COLDSTART = 0
+        m.options.TIME_SHIFT = 0
 
-            # Avancer d'un pas de temps (dt est en secondes)
-            current_step_time += timedelta(seconds=self.dt)
-            
-        return prices
+        self._m, self._Ti, self._P_heat, self._Text, self._Price, self._W = m, Ti, P_heat, Text, Price, W
+        self._violation_min, self._violation_max = violation_min, violation_max
+
+    def _discard_models(self):
+        """Drop the persistent models (rebuilt on next use) and the GEKKO run directory."""
+        self._qp = None
+        if self._m is not None:
+            try:
+                self._m.cleanup()
+            except Exception as e:
+                logger.warning(f"GEKKO cleanup failed: {e}")
+            self._m = None
+
+    def _build_qp(self):
+        """
+        Same problem as _build_model as a sparse convex QP, z = [Ti_0..Ti_N, u_0..u_N-1, smin_0..smin_N, smax_0..smax_N]
+        with u = P_heat / P_max in [0, 1] (Watts next to €/kWh * 1e-4 make OSQP's ADMM very ill-conditioned).
+        Only q (prices) and l/u (T_init, T_ext) change between solves: OSQP keeps its factorization and warm starts.
+        """
+        n_t = self.horizon
+        N = n_t - 1 # Intervals of time_grid
+        i_p, i_smin, i_smax = n_t, n_t + N, 2 * n_t + N
+        n = 3 * n_t + N
+        # Exact step of C dT/dt = UA (Text - T) + P (see ThermalModel), one per grid interval
+        decay = np.array([self.model.decay(h) for h in np.diff(self.time_grid)])
+        p_max = float(settings.SIM_HEATER_MAX_POWER)
+        gain_u = (1.0 - decay) * p_max / self.model.UA
+        Rho = settings.RHO
+        w = self._node_weights
+
+        # Cost: W * (Price * P * 1e-4 + Rho * smin^2 + 10 Rho * smax^2) (OSQP minimizes 1/2 z'Pz + q'z)
+        P_diag = np.zeros(n)
+        P_diag[i_smin:i_smax] = 2 * Rho * w
+        P_diag[i_smax:] = 2 * Rho * 10 * w
+        P = sp.diags(P_diag, format="csc")
+
+        eye_t = sp.eye(n_t, format="csc")
+        # Ti_0 = T_init
+        A_init = sp.csc_matrix(([1.0], ([0], [0])), shape=(1, n))
+        # Ti_k+1 - decay_k Ti_k - gain_u_k u_k = (1 - decay_k) Text_k
+        dyn_t = sp.eye(N, n_t, k=1) - sp.diags(decay, shape=(N, n_t))
+        A_dyn = sp.hstack([dyn_t, -sp.diags(gain_u), sp.csc_matrix((N, 2 * n_t))])
+        # smin_k + Ti_k >= Tmin, smax_k - Ti_k >= -Tmax
+        A_smin = sp.hstack([eye_t, sp.csc_matrix((n_t, N)), eye_t, sp.csc_matrix((n_t, n_t))])
+        A_smax = sp.hstack([-eye_t, sp.csc_matrix((n_t, N + n_t)), eye_t])
+        # 0 <= u_k <= 1, s >= 0
+        A_bounds = sp.hstack([sp.csc_matrix((N + 2 * n_t, n_t)), sp.eye(N + 2 * n_t)])
+        A = sp.vstack([A_init, A_dyn, A_smin, A_smax, A_bounds], format="csc")
+
+        l = np.concatenate([[0.0], np.zeros(N), np.full(n_t, settings.T_MIN), np.full(n_t, -settings.T_MAX),
+                            np.zeros(N + 2 * n_t)])
+        u = np.concatenate([[0.0], np.zeros(N), np.full(n_t, np.inf), np.full(n_t, np.inf),
+                            np.ones(N), np.full(2 * n_t, np.inf)])
+
+        prob = osqp.OSQP()
+        prob.setup(P, np.zeros(n), A, l, u, warm_starting=True, polishing=True, max_iter=10000, verbose=False)
+        self._qp = prob
+        self._qp_l, self._qp_u, self._qp_q = l, u, np.zeros(n)
+        self._qp_dyn_gain = 1.0 - decay
+        self._qp_idx = (i_p, n_t)
+        # Last solution and the simulated time it was computed at (see _shift_solution)
+        self._qp_prev = None
+        # u_k is held over interval k, i.e. until node k+1: energy cost weighted like that node
+        self._qp_price_gain = 1e-4 * p_max * w[1:]
+
+    def _solve_qp(self, T_init: float, T_ext_forecast: np.ndarray, Prices_forecast: np.ndarray):
+        """Solve the QP for the current forecasts. Returns (P_0, Ti trajectory) or None if OSQP did not converge."""
+        if self._qp is None:
+            self._build_qp()
+        i_p, n_t = self._qp_idx
+        N = n_t - 1
+        l, u, q = self._qp_l, self._qp_u, self._qp_q
+        l[0] = u[0] = T_init
+        l[1:N + 1] = u[1:N + 1] = self._qp_dyn_gain * T_ext_forecast[:N]
+        q[i_p:i_p + N] = self._qp_price_gain * Prices_forecast[:N]
+        self._qp.update(q=q, l=l, u=u)
+        if self._qp_prev is not None:
+            # The horizon moved on since the last solve: start from the previous plan moved by the same amount
+            x_prev, t_prev = self._qp_prev
+            elapsed = (self.current_time - t_prev).total_seconds()
+            if 0 < elapsed < self.time_grid[-1]:
+                x0 = self._shift_solution(x_prev, elapsed)
+                x0[0] = T_init
+                self._qp.warm_start(x=x0)
+
+        res = self._qp.solve()
+        if res.info.status not in ("solved", "solved inaccurate"):
+            logger.warning(f"OSQP did not converge ({res.info.status}), falling back to GEKKO")
+            self._qp_prev = None
+            return None
+        self._qp_prev = (res.x.copy(), self.current_time)
+        return float(np.clip(res.x[i_p], 0.0, 1.0)) * settings.SIM_HEATER_MAX_POWER, res.x[:n_t]
+
+    def _shift_solution(self, x: np.ndarray, elapsed: float) -> np.ndarray:
+        """Resample a QP solution on time_grid + elapsed (held constant past the end of the horizon)."""
+        n_t = self.horizon
+        N = n_t - 1
+        grid = self.time_grid
+        shifted = np.empty_like(x)
+        pos = 0
+        # x = [Ti, u, smin, smax]: node values, except u which is held over each interval
+        for size in (n_t, N, n_t, n_t):
+            t = grid if size == n_t else grid[:-1]
+            shifted[pos:pos + size] = np.interp(t + elapsed, t, x[pos:pos + size])
+            pos += size
+        return shifted
+
+    def _solve_gekko(self, T_init: float, T_ext_forecast: np.ndarray, Prices_forecast: np.ndarray):
+        if self._m is None:
+            self._build_model()
+        self._Ti.value = T_init
+        self._Text.value = T_ext_forecast
+        self._Price.value = Prices_forecast
+        # Reassigned like the forecasts: a parameter left alone would be time-shifted if TIME_SHIFT were enabled
+        self._W.value = self._node_weights
+
+        # Solve
+        self._m.solve(disp=False)
+
+        # 3. Extract Result
+        return self._P_heat.NEWVAL, self._Ti.value
+
+    def _optimize_sync(self, T_init: float, T_ext_forecast: np.ndarray, Prices_forecast: np.ndarray):
+        """
+        Blocking part of the optimization: OSQP when available, GEKKO/APOPT otherwise or if the QP fails.
+        Runs in a worker thread: MQTT ingress and HTTP endpoints keep being served meanwhile.
+        """
+        if osqp is not None:
+            try:
+                result = self._solve_qp(T_init, T_ext_forecast, Prices_forecast)
+            except Exception as e:
+                # Incompatible osqp install or setup error: the GEKKO model still gives an action
+                logger.warning(f"OSQP solve failed, falling back to GEKKO: {e}")
+                self._qp = None
+                result = None
+            if result is not None:
+                return result
+        return self._solve_gekko(T_init, T_ext_forecast, Prices_forecast)
 
     async def optimize(self, T_init: float):
         """Run MPC optimization asynchronously based on an initial temperature."""
@@ -118,58 +377,11 @@ class MPCService:
             T_ext_forecast = self.get_mock_weather_forecast()
             Prices_forecast = await self.get_tempo_electricity_prices()
             
-            # 2. Setup GEKKO Model
-            m = GEKKO(remote=False) # Attempt local solve first
-            m.time = np.linspace(0, self.horizon * self.dt, self.horizon)
-
-            # Variables
-            # Indoor Temperature (Large bounds to prevent infeasibility during transient high temps)
-            Ti = m.Var(value=T_init, lb=-20, ub=60, name='Ti')
-            # Heating Power (Control Variable)
-            P_heat = m.MV(value=0, lb=0, ub=settings.SIM_HEATER_MAX_POWER, name='P_heat')
-            P_heat.STATUS = 1  # Allow optimizer to modify
-            P_heat.DCOST = 0   # No cost for changing setting
-
-            # Parameters
-            Text = m.Param(value=T_ext_forecast, name='Text')
-            Price = m.Param(value=Prices_forecast, name='Price')
-            
-            # Constants
-            R = settings.SIM_ROOM_R
-            C = settings.SIM_ROOM_C
-            Area = settings.AREA
-            Tmin = settings.T_MIN
-            Tmax = settings.T_MAX
-            Rho = settings.RHO
-
-            # Equation of State (Discretized)
-            # Thermodynamique: dT/dt = (Text - Ti)*Area/(R*C) + P/C
-            m.Equation(Ti.dt() == (Text - Ti) * Area / (R * C) + P_heat / C)
-
-            # Objective Function
-            # Minimize Cost + Penalty for discomfort
-            # Discomfort = Rho * (max(0, Tmin - Ti)**2) + Rho * (max(0, Ti - Tmax)**2)
-            
-            # Variables de relaxation (slack) pour confort violation min et max
-            violation_min = m.Var(value=0, lb=0)
-            violation_max = m.Var(value=0, lb=0)
-            
-            m.Equation(violation_min >= Tmin - Ti)
-            m.Equation(violation_max >= Ti - Tmax)
-            
-            # Pénalité asymétrique: chauffer pour rien coûte cher, donc surchauffe très réprimée
-            penalty_weight = Rho * 10 
-            
-            m.Obj(Price * P_heat * 1e-4 + Rho * violation_min**2 + penalty_weight * violation_max**2)
-
-            # Solve
-            m.options.IMODE = 6 # Control
-            m.options.NODES = 3 # Collocation nodes
-            await asyncio.to_thread(m.solve, disp=False)
-
-            # 3. Extract Result
-            optimal_power = P_heat.NEWVAL
-            predicted_temp = Ti.value
+            # 2. Update + solve the persistent model off the event loop (one solve at a time on the shared model)
+            async with self._solve_lock:
+                optimal_power, predicted_temp = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self._optimize_sync, T_init, T_ext_forecast, Prices_forecast
+                )
 
             logger.info(f"Optimization Success! Next Power: {optimal_power:.2f} W, Next Temp: {predicted_temp[1]:.2f} C")
             
@@ -180,5 +392,7 @@ class MPCService:
 
         except Exception as e:
             logger.error(f"MPC Optimization Failed: {e}")
+            # Les modèles peuvent être dans un état incohérent : reconstruction au prochain appel
+            self._discard_models()
             # En cas d'échec, stratégie de sécurité : on coupe le chauffage
             return {"valve_position": 0, "planned_power": 0.0, "error": str(e)}
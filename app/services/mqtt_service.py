@@ -1,7 +1,8 @@
 import logging
-import json
+import orjson
 import asyncio
 from datetime import datetime
+from functools import lru_cache
 from typing import Callable, Awaitable, Any, Optional
 from aiomqtt import Client
 from aiomqtt.exceptions import MqttError
@@ -9,6 +10,22 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=256)
+def _route(topic: str) -> tuple[Optional[str], Optional[str]]:
+    """
+    Classify a topic once: ("sensors", location) for home/sensors/<location>/..., ("valve", location) for
+    home/<location>/valve/set, ("clock", None) for home/sys/clock, (None, None) otherwise.
+    """
+    parts = topic.split('/')
+    if len(parts) >= 3:
+        if "sensors" in parts:
+            return "sensors", parts[2]
+        if "valve" in parts and "set" in parts:
+            return "valve", parts[1]
+    if "sys" in parts and "clock" in parts:
+        return "clock", None
+    return None, None
+
 class MQTTService:
     def __init__(self):
         self.client = Client(
@@ -20,6 +37,46 @@ class MQTTService:
         self.on_sensor_data: Optional[Callable[[str, dict, Any], Awaitable[None]]] = None
         self.on_valve_set: Optional[Callable[[str, dict], Awaitable[None]]] = None
         self.on_clock_sync: Optional[Callable[[str], Awaitable[None]]] = None
+        self._cmd_topic = settings.MQTT_TOPIC_COMMAND.replace('+', 'chambre')
+        # Topic kind (see _route) -> handler(location, raw payload)
+        self._dispatch = {
+            "sensors": self._handle_sensor,
+            "valve": self._handle_valve,
+            "clock": self._handle_clock,
+        }
+
+    async def _handle_sensor(self, location: str, payload: bytes):
+        # orjson parses the raw bytes directly
+        data = orjson.loads(payload)
+        sim_time = None
+        if "sim_time" in data:
+            try:
+                sim_time = datetime.fromisoformat(data["sim_time"].replace('Z', '+00:00'))
+            except ValueError:
+                pass
+        
+        if self.on_sensor_data:
+            await self.on_sensor_data(location, data, sim_time)
+
+    async def _handle_valve(self, location: str, payload: bytes):
+        data = orjson.loads(payload)
+        if self.on_valve_set:
+            await self.on_valve_set(location, data)
+
+    async def _handle_clock(self, location: Optional[str], payload: bytes):
+        # Bare ISO timestamp, not JSON
+        if self.on_clock_sync:
+            await self.on_clock_sync(payload.decode())
+
+    async def publish_command(self, payload: dict, qos: int = 0, retain: bool = True) -> bytes:
+        """
+        Publish a valve command on the command topic.
+        Retained by default: a (re)connecting valve controller immediately gets the last command.
+        """
+        message = orjson.dumps(payload)
+        await self.client.publish(self._cmd_topic, message, qos=qos, retain=retain)
+        logger.info(f"Published command: {self._cmd_topic} -> {message.decode()}")
+        return message
 
     async def start(self):
         """Connect and subscribe to topics with infinite reconnection on network loss."""
@@ -32,41 +89,23 @@ class MQTTService:
                     logger.info(f"Subscribed to topic: {settings.MQTT_TOPIC}")
                     
                     async for message in self.client.messages:
-                        payload_str = message.payload.decode()
                         topic = message.topic.value
-                        logger.info(f"Received message on {topic}: {payload_str}")
+                        # Per-message trace only when enabled: no decode/formatting at sensor rate
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(f"Received message on {topic}: {message.payload.decode()}")
                         
+                        # Topics repeat: classification is cached, dispatch is a dict lookup
+                        kind, location = _route(topic)
+                        handler = self._dispatch.get(kind)
+                        if handler is None:
+                            continue
+                        if kind == "valve" and message.retain:
+                            # Our own retained command replayed on (re)subscribe: not a new valve event
+                            continue
                         try:
-                            data = json.loads(payload_str)
-                            parts = topic.split('/')
-                            if len(parts) >= 3:
-                                if "sensors" in parts:
-                                    location = parts[2]
-                                    sim_time = None
-                                    if "sim_time" in data:
-                                        try:
-                                            sim_time = datetime.fromisoformat(data["sim_time"].replace('Z', '+00:00'))
-                                        except ValueError:
-                                            pass
-                                    
-                                    if self.on_sensor_data:
-                                        await self.on_sensor_data(location, data, sim_time)
-                                        
-                                elif "valve" in parts and "set" in parts:
-                                    location = parts[1]
-                                    if self.on_valve_set:
-                                        await self.on_valve_set(location, data)
-                                        
-                            elif "sys" in parts and "clock" in parts:
-                                if self.on_clock_sync:
-                                    await self.on_clock_sync(payload_str)
-                                    
-                        except json.JSONDecodeError as e:
-                            if "clock" in topic:
-                                if self.on_clock_sync:
-                                    await self.on_clock_sync(payload_str)
-                            else:
-                                logger.error(f"JSON Decode Error: {e}")
+                            await handler(location, message.payload)
+                        except orjson.JSONDecodeError as e:
+                            logger.error(f"JSON Decode Error: {e}")
                             
             except MqttError as error:
                 logger.error(f'MQTT Error "{error}". Reconnecting in {reconnect_interval} seconds.')
@@ -1,8 +1,14 @@
 import asyncio
 import logging
 import random
-import json
+import orjson
 from aiomqtt import Client
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+if uvloop is not None and not hasattr(uvloop, "run"):
+    uvloop = None # uvloop.run() exists since 0.18
 from app.config import settings
 
 # Setup Logging
@@ -10,6 +16,8 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("Simulator")
 
 class SensorSimulator:
+    TOPIC = "home/sensors/living_room/metrics"
+
     async def connect_and_publish(self):
         async with Client(hostname=settings.MQTT_BROKER, port=settings.MQTT_PORT) as client:
             self.client = client
@@ -29,15 +37,14 @@ class SensorSimulator:
             "battery": random.randint(80, 100)
         }
         
-        topic = "home/sensors/living_room/metrics"
-        await self.client.publish(topic, json.dumps(payload))
-        logger.info(f"Simulated: {topic} -> {payload}")
+        # orjson encodes straight to bytes, sent as-is
+        await self.client.publish(self.TOPIC, orjson.dumps(payload))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Simulated: {self.TOPIC} -> {payload}")
 
     def __init__(self):
         self.running = True
 
-
-
     async def start(self):
         await self.connect_and_publish()
 
@@ -47,8 +54,10 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        logger.info("Simulator stopped.")
+        # libuv event loop when available
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Simulator stopped.")
@@ -1,10 +1,17 @@
 import asyncio
 import logging
 import argparse
-from datetime import datetime, timedelta
+import math
+from datetime import datetime, timedelta, timezone
 import os
-import random
 import sys
+import numpy as np
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+if uvloop is not None and not hasattr(uvloop, "run"):
+    uvloop = None # uvloop.run() exists since 0.18
 
 # Hack pour développement local hors-docker
 if not os.environ.get("INFLUX_HOST"):
@@ -28,6 +35,8 @@ logging.getLogger("urllib3").setLevel(logging.WARNING)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("BatchSimulator")
 
+INFLUX_BATCH_SIZE = 1000 # Points per InfluxDB write request
+
 
 async def run_batch_simulation(start_date_str: str, end_date_str: str, mode: str, reset_db: bool):
     """Exécute une simulation thermique accélérée sans attendre le temps réel."""
@@ -48,7 +57,7 @@ async def run_batch_simulation(start_date_str: str, end_date_str: str, mode: str
     
     if reset_db:
         logger.warning("Vidage de la base de données InfluxDB...")
-        influx_service.clear_database()
+        await influx_service.clear_database()
     
     # Init Physics & Loader
     loader = ScenarioLoader(settings.SIM_SCENARIO_FILE)
@@ -61,64 +70,91 @@ async def run_batch_simulation(start_date_str: str, end_date_str: str, mode: str
         controller = ManualController(target_temp=20.0, trigger_delta=0.5)
 
     # Initial State
-    current_time = start_date
     T_int = loader.data.get("initial_temp", settings.SIM_INITIAL_TEMP)
     T_m = T_int
     valve_pos = 0.0
     total_cost = 0.0
     dt_sim = settings.SIM_TIME_STEP # 900s (15 min) par defaut pour coller avec MPC, mais on utilise les settings
     
-    step_count = 0
     total_steps = int((end_date - start_date).total_seconds() / dt_sim)
     
     logger.info(f"Paramètres: dt={dt_sim}s, total_steps={total_steps}, T_init={T_int}°C")
 
+    # Le MPC n'applique que sa première action : on ne le résout qu'à sa période de contrôle
+    mpc_every = max(1, settings.SIM_MPC_INTERVAL // dt_sim)
+    if mode == "mpc":
+        logger.info(f"MPC toutes les {mpc_every} étapes ({settings.SIM_MPC_INTERVAL}s): ~{math.ceil(total_steps / mpc_every)} résolutions au lieu de {total_steps}")
+
+    # Conditions extérieures et prix précalculés pour tous les pas (la boucle ne fait plus que de l'indexation)
+    n_steps = math.ceil((end_date - start_date).total_seconds() / dt_sim) # Pas effectués par la boucle
+    offsets = np.arange(n_steps, dtype=np.int64) * dt_sim
+    start_second = start_date.hour * 3600 + start_date.minute * 60 + start_date.second
+    hour_arr = ((start_second + offsets) % 86400 // 60) / 60.0 # current_time.hour + current_time.minute / 60
+    # Utiliser un jour générique du scenario (on boucle si la simu dépasse les jours scénarisés)
+    sim_day_arr = (offsets // 86400) % max(1, loader.data.get("duration_days", 3))
+    T_ext_arr, neb_arr = loader.get_weather_series(sim_day_arr, hour_arr)
+    price_arr = loader.get_price_series(hour_arr)
+    P_sol_arr = physics.calculate_solar_gain_batch(hour_arr, neb_arr)
+    # Bruit capteur tiré en une fois
+    noise_arr = np.random.normal(0.0, settings.SIM_SENSOR_NOISE_STD, n_steps)
+
+    # Mode manuel : le contrôleur à seuil ne dépend que de l'état, toute la trajectoire est intégrée en un appel
+    if mode == "manual":
+        T_int_arr, T_m_arr, valve_arr = physics.simulate_setpoint(
+            t_air0=T_int,
+            t_m0=T_m,
+            t_ext=T_ext_arr,
+            p_sol=P_sol_arr,
+            p_int=0.0,
+            t_low=controller.target_temp - controller.trigger_delta
+        )
+
+    # Horodatage Influx en secondes epoch entières (naïf = UTC, comme InfluxService) : pas de datetime par pas
+    base_ts = int((start_date if start_date.tzinfo else start_date.replace(tzinfo=timezone.utc)).timestamp())
+    time_arr = (base_ts + offsets + dt_sim).tolist() # Fin de chaque pas
+
+    # Points accumulated between two InfluxDB writes
+    buffer = []
+
     # ----- MAIN LOOP -----
-    while current_time < end_date:
+    for step_count in range(n_steps):
         # 1. Obtenir les Conditions Extérieures
-        hour = current_time.hour + current_time.minute / 60.0
-        # Utiliser un jour générique du scenario (on boucle si la simu dépasse les jours scénarisés)
-        sim_day = (current_time - start_date).days % max(1, loader.data.get("duration_days", 3))
-        
-        weather = loader.get_weather_at(sim_day, hour)
-        T_ext = weather['temperature']
-        nebulosity = weather['nebulosity']
+        T_ext = float(T_ext_arr[step_count])
         
         # 2. Obtenir les Prix
-        pricing = loader.get_price_at(sim_day, hour)
-        elec_price = pricing['price']
-        tariff_type = pricing['tariff']
+        elec_price = float(price_arr[step_count])
+
+        P_sol = float(P_sol_arr[step_count])
+        P_int = 0.0
 
-        # 3. Mettre à Jour Contrôleur & Demander Action
         if mode == "mpc":
-            controller.update_time(current_time.isoformat())
-            # Le MPC tourne toutes les X minutes (15 min en général). 
-            # Dans ce MVP, on l'appelle à chaque pas de temps pour recalculer.
-            action = await controller.optimize(T_int)
-            if action and "valve_position" in action:
-                valve_pos = action["valve_position"]
+            # 3. Mettre à Jour Contrôleur & Demander Action
+            # Le MPC tourne toutes les SIM_MPC_INTERVAL secondes, la vanne est maintenue entre deux résolutions
+            if step_count % mpc_every == 0:
+                controller.update_time((start_date + timedelta(seconds=int(offsets[step_count]))).isoformat())
+                action = await controller.optimize(T_int)
+                if action and "valve_position" in action:
+                    valve_pos = action["valve_position"]
+
+            # 4. Calculer la Physique
+            T_int_next, T_m_next = physics.calculate_next_state(
+                t_air_prev=T_int,
+                t_m_prev=T_m,
+                t_ext=T_ext,
+                valve_pos=valve_pos,
+                p_sol=P_sol,
+                p_int=P_int
+            )
         else:
-            action = await controller.optimize(T_int)
-            valve_pos = action["valve_position"]
-
-        # 4. Calculer la Physique
+            # 3-4. Trajectoire manuelle précalculée
+            valve_pos = int(valve_arr[step_count])
+            T_int_next = float(T_int_arr[step_count])
+            T_m_next = float(T_m_arr[step_count])
         P_heat_requested = (float(valve_pos) / 100.0) * float(settings.SIM_HEATER_MAX_POWER)
-        P_sol = physics.calculate_solar_gain(current_time, nebulosity)
-        P_int = 0.0
-
-        T_int_next, T_m_next = physics.calculate_next_state(
-            t_air_prev=T_int,
-            t_m_prev=T_m,
-            t_ext=T_ext,
-            valve_pos=valve_pos,
-            p_sol=P_sol,
-            p_int=P_int
-        )
         
         # 5. Mettre à jour l'état et calculer le coût
         T_int = T_int_next
         T_m = T_m_next
-        current_time += timedelta(seconds=dt_sim)
         
         cost_step = P_heat_requested * (dt_sim / 3600.0) * elec_price / 1000.0
         total_cost += cost_step
@@ -127,16 +163,16 @@ async def run_batch_simulation(start_date_str: str, end_date_str: str, mode: str
         # On écrit directement sans passer par MQTT
         if True: # On log tout, mais on évite de spammer la console
             if step_count % int(24 * 3600 / dt_sim) == 0: # Tous les jours
-                logger.info(f"Progression: {current_time} | T_int={T_int:.2f}°C | Valve={valve_pos}% | Cost={total_cost:.2f}€")
+                logger.info(f"Progression: {start_date + timedelta(seconds=int(offsets[step_count]) + dt_sim)} | T_int={T_int:.2f}°C | Valve={valve_pos}% | Cost={total_cost:.2f}€")
 
         # Sauvegarde InfluxDB pour Grafana
-        noise = random.gauss(0, settings.SIM_SENSOR_NOISE_STD)
+        noise = float(noise_arr[step_count])
         T_measured = T_int + noise
         
-        await influx_service.write_data(
-            measurement="sensors",
-            tags={"location": "chambre"},
-            fields={
+        buffer.append({
+            "measurement": "sensors",
+            "tags": {"location": "chambre"},
+            "fields": {
                 "temperature": float(T_measured),
                 "mass_temperature": float(T_m),
                 "external_temperature": float(T_ext),
@@ -147,16 +183,27 @@ async def run_batch_simulation(start_date_str: str, end_date_str: str, mode: str
                 "heating_cost_step": float(cost_step),
                 "heating_cost_cumulative": float(total_cost)
             },
-            timestamp=current_time
-        )
-        
-        step_count += 1
+            "time": time_arr[step_count]
+        })
+        if len(buffer) >= INFLUX_BATCH_SIZE:
+            await influx_service.write_batch(buffer)
+            buffer.clear()
+
+    await influx_service.write_batch(buffer)
 
     # End
     logger.info("==================================================")
     logger.info(f"Simulation Terminée ! Mode={mode}. Coût Total: {total_cost:.2f}€")
     logger.info("==================================================")
     await influx_service.close()
+    if mode == "mpc":
+        await controller.aclose()
+
+def run(coro):
+    """asyncio.run on uvloop's event loop when it is installed."""
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run Digital Twin Offline Batch Simulation")
@@ -171,14 +218,18 @@ if __name__ == "__main__":
         logger.info("Exécution du reset InfluxDB seul...")
         from app.services.influx_service import InfluxService
         service = InfluxService()
-        service.clear_database()
-        asyncio.run(service.close())
+
+        async def reset_only():
+            await service.clear_database()
+            await service.close()
+
+        run(reset_only())
         sys.exit(0)
         
     if not args.start or not args.end:
         parser.error("--start and --end are required when running a simulation.")
     
-    asyncio.run(run_batch_simulation(
+    run(run_batch_simulation(
         start_date_str=args.start,
         end_date_str=args.end,
         mode=args.mode,